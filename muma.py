@@ -7,23 +7,81 @@ Web远程桌面控制系统 - 服务端（修改版）
 
 import asyncio
 import websockets
-import json
+import msgpack
+import orjson
 import base64
+import gzip
 import io
-import threading
+import logging
+import logging.handlers
+import queue
+import sys
 import time
-from flask import Flask, render_template_string, request, jsonify
-from flask_cors import CORS
+from collections import Counter
+from dataclasses import dataclass
+from aiohttp import web
+
+# 每个客户端出站队列的最大长度，屏幕帧超出时丢弃最旧的一帧
+OUTBOUND_QUEUE_SIZE = 4
+
+# 控制消息逐条转发且不能丢，出站队列为其留出更大的上限以容纳滚轮等突发事件
+CONTROL_QUEUE_SIZE = 64
+
+# 向观看者广播屏幕帧的最高帧率，提供者更快时多帧合并为一次广播
+BROADCAST_FPS = 30
+
+# 状态接口缓存时间（秒），多个浏览器同时轮询时只序列化一次
+STATUS_CACHE_TTL = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+def is_msgpack_frame(message):
+    """二进制帧是否为msgpack打包的消息（首字节为msgpack map标记）"""
+    if not isinstance(message, bytes) or not message:
+        return False
+    first = message[0]
+    return 0x80 <= first <= 0x8f or first in (0xde, 0xdf)
+
+
+def setup_logging():
+    """日志经队列交给后台线程输出，事件循环线程不直接写stdout"""
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+    # 第三方库的逐连接、逐请求日志不输出，页面每次轮询状态都会产生一条
+    for name in ('websockets', 'aiohttp.access'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return listener
+
+
+@dataclass(slots=True)
+class ClientRecord:
+    """单个连接的状态：角色、出站队列和发送任务"""
+    websocket: object
+    role: str
+    queue: asyncio.Queue
+    writer: asyncio.Task = None
 
 
 class RemoteDesktopServer:
     def __init__(self):
-        self.clients = set()  # 所有连接的客户端
-        self.screen_providers = set()  # 提供屏幕数据的客户端
-        self.screen_viewers = set()  # 观看屏幕的客户端
-        self.control_clients = set()  # 可以控制的客户端
+        self.clients = {}  # 所有连接的客户端: websocket -> ClientRecord
+        self._viewers = None  # 观看者记录快照，注册状态变化时置空
+        self._providers = None  # 提供者记录快照，注册状态变化时置空
         self.running = True
-        self.current_screen_data = None  # 当前屏幕数据
+        self.current_screen_message = None  # 当前屏幕数据序列化后的消息
+        self.frame_interval = 1 / BROADCAST_FPS  # 屏幕帧广播间隔（秒）
+        self._status_cache = b''  # 序列化后的服务器状态
+        self._status_cache_time = float('-inf')
+        self._screen_info_bytes = None  # 序列化后的screen_info，尺寸变化时置空
         self.screen_info = {
             'width': 0,
             'height': 0,
@@ -31,180 +89,258 @@ class RemoteDesktopServer:
             'original_height': 0
         }
 
+        # 消息类型 -> 处理函数，处理函数签名为 (websocket, message, data)
+        self._dispatch = {
+            'register': self._on_register,
+            'screen_data': self._on_screen_data,
+            'mouse': self._on_control,
+            'keyboard': self._on_control,
+            'get_screenshot': self._on_get_screenshot,
+        }
+
+    @property
+    def screen_viewers(self):
+        """观看者的ClientRecord元组"""
+        if self._viewers is None:
+            self._viewers = tuple(r for r in self.clients.values() if r.role == 'viewer')
+        return self._viewers
+
+    @property
+    def screen_providers(self):
+        """屏幕提供者的ClientRecord元组"""
+        if self._providers is None:
+            self._providers = tuple(r for r in self.clients.values() if r.role == 'provider')
+        return self._providers
+
     async def register_client(self, websocket, client_type='viewer'):
-        """注册新客户端"""
-        self.clients.add(websocket)
+        """注册新客户端，已注册的连接只更新角色"""
+        if client_type not in ('provider', 'controller'):
+            client_type = 'viewer'
+
+        record = self.clients.get(websocket)
+        if record is None:
+            # 为每个连接创建出站队列和发送任务，广播时只需入队
+            record = ClientRecord(websocket, client_type, asyncio.Queue())
+            record.writer = asyncio.create_task(self._writer_loop(record))
+            self.clients[websocket] = record
+        else:
+            record.role = client_type
+        self._viewers = self._providers = None
 
         if client_type == 'provider':
-            self.screen_providers.add(websocket)
-            print(f"屏幕提供者已连接，当前提供者数: {len(self.screen_providers)}")
+            logger.info("屏幕提供者已连接，当前提供者数: %d", len(self.screen_providers))
         elif client_type == 'controller':
-            self.control_clients.add(websocket)
-            print(f"控制客户端已连接，当前控制者数: {len(self.control_clients)}")
+            logger.info("控制客户端已连接，当前控制者数: %d", self._count_role('controller'))
         else:
-            self.screen_viewers.add(websocket)
-            print(f"观看客户端已连接，当前观看者数: {len(self.screen_viewers)}")
+            logger.info("观看客户端已连接，当前观看者数: %d", len(self.screen_viewers))
 
-        print(f"总连接数: {len(self.clients)}")
+        logger.info("总连接数: %d", len(self.clients))
 
-        # 如果是新的观看者且有当前屏幕数据，立即发送
-        if client_type == 'viewer' and self.current_screen_data:
-            try:
-                await websocket.send(json.dumps(self.current_screen_data))
-            except:
-                pass
+        # 如果是新的观看者且有当前屏幕数据，放入其发送队列
+        if client_type == 'viewer' and self.current_screen_message:
+            self._enqueue(record, self.current_screen_message)
 
     async def unregister_client(self, websocket):
         """注销客户端"""
-        self.clients.discard(websocket)
-        self.screen_providers.discard(websocket)
-        self.screen_viewers.discard(websocket)
-        self.control_clients.discard(websocket)
-        print(f"客户端已断开，当前连接数: {len(self.clients)}")
-
-    async def handle_screen_data(self, data):
-        """处理客户端发送的屏幕数据"""
+        record = self.clients.pop(websocket, None)
+        if record is None:
+            return
+
+        self._viewers = self._providers = None
+        logger.info("客户端已断开，当前连接数: %d", len(self.clients))
+
+        # 停止该连接的发送任务
+        if record.writer is not asyncio.current_task():
+            record.writer.cancel()
+
+    def _count_role(self, role):
+        """统计指定角色的连接数"""
+        return sum(1 for r in self.clients.values() if r.role == role)
+
+    async def handle_screen_data(self, message, data):
+        """处理客户端发送的屏幕数据，只更新最新帧，由广播任务统一转发"""
+        # 更新屏幕信息，尺寸变化时使缓存的序列化结果失效
+        screen_info = self.screen_info
+        for key in ('width', 'height', 'original_width', 'original_height'):
+            value = data.get(key, 0)
+            if screen_info[key] != value:
+                screen_info[key] = value
+                self._screen_info_bytes = None
+
+        # 直接复用提供者发来的原始消息，避免每帧重新序列化
+        self.current_screen_message = message
+
+    async def handle_screen_data_binary(self, message):
+        """处理msgpack二进制屏幕帧，原始字节直接缓存并转发"""
         try:
-            # 更新当前屏幕数据
-            self.current_screen_data = {
-                'type': 'screenshot',
-                'data': data.get('data'),
-                'width': data.get('width', 0),
-                'height': data.get('height', 0),
-                'original_width': data.get('original_width', 0),
-                'original_height': data.get('original_height', 0),
-                'timestamp': time.time()
-            }
-
-            # 更新屏幕信息
-            self.screen_info.update({
-                'width': data.get('width', 0),
-                'height': data.get('height', 0),
-                'original_width': data.get('original_width', 0),
-                'original_height': data.get('original_height', 0)
-            })
-
-            # 转发给所有观看客户端
-            if self.screen_viewers:
-                message = json.dumps(self.current_screen_data)
-                disconnected = set()
-
-                for viewer in self.screen_viewers:
-                    try:
-                        await viewer.send(message)
-                    except websockets.exceptions.ConnectionClosed:
-                        disconnected.add(viewer)
-                    except Exception as e:
-                        print(f"发送屏幕数据错误: {e}")
-                        disconnected.add(viewer)
-
-                # 移除断开的连接
-                for client in disconnected:
-                    await self.unregister_client(client)
-
+            data = msgpack.unpackb(message, raw=False)
         except Exception as e:
-            print(f"处理屏幕数据错误: {e}")
+            logger.warning("无效的二进制屏幕帧: %s", e)
+            return
+        await self.handle_screen_data(message, data)
+
+    async def broadcast_loop(self):
+        """按固定帧率将最新屏幕帧发给所有观看者"""
+        last_sent = None
+        while self.running:
+            message = self.current_screen_message
+            if message is not None and message is not last_sent:
+                # 放入所有观看客户端的发送队列（遍历缓存的元组快照）
+                for viewer in self.screen_viewers:
+                    self._enqueue(viewer, message)
+                last_sent = message
+            await asyncio.sleep(self.frame_interval)
 
     async def handle_control_event(self, websocket, data):
-        """处理控制事件，转发给屏幕提供者"""
-        try:
-            if not self.screen_providers:
-                print("没有可用的屏幕提供者来处理控制事件")
+        """处理控制事件，逐条转发给屏幕提供者
+
+        提供者是外部程序，只认识单条mouse/keyboard消息，因此不做合并。
+        """
+        if not self.screen_providers:
+            logger.warning("没有可用的屏幕提供者来处理控制事件")
+            return
+
+        # 编码一次后放入所有屏幕提供者的发送队列，发送错误由各自的发送任务处理
+        message = orjson.dumps(data)
+        for provider in self.screen_providers:
+            self._enqueue(provider, message, drop_oldest=False)
+
+    def _enqueue(self, record, message, drop_oldest=True):
+        """将消息放入客户端出站队列，不等待发送完成
+
+        队列本身不设上限，按消息类型限制长度：屏幕帧超过OUTBOUND_QUEUE_SIZE时丢弃最旧的一条，
+        控制消息超过CONTROL_QUEUE_SIZE时说明客户端已严重阻塞，丢弃新消息。
+        """
+        queue = record.queue
+        if not drop_oldest:
+            if queue.qsize() >= CONTROL_QUEUE_SIZE:
+                # 控制消息不能乱序替换
+                logger.warning("客户端发送队列已满，丢弃控制消息")
                 return
-
-            # 转发控制事件给所有屏幕提供者
-            message = json.dumps(data)
-            disconnected = set()
-
-            for provider in self.screen_providers:
-                try:
-                    await provider.send(message)
-                except websockets.exceptions.ConnectionClosed:
-                    disconnected.add(provider)
-                except Exception as e:
-                    print(f"转发控制事件错误: {e}")
-                    disconnected.add(provider)
-
-            # 移除断开的连接
-            for client in disconnected:
-                await self.unregister_client(client)
-
+        elif queue.qsize() >= OUTBOUND_QUEUE_SIZE:
+            # 屏幕帧只关心最新的一帧，丢弃最旧的
+            queue.get_nowait()
+        queue.put_nowait(message)
+
+    async def _writer_loop(self, record):
+        """逐条发送客户端出站队列中的消息"""
+        websocket = record.websocket
+        queue = record.queue
+        try:
+            while True:
+                message = await queue.get()
+                await websocket.send(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
         except Exception as e:
-            print(f"处理控制事件错误: {e}")
+            logger.error("发送消息错误: %s", e)
+
+        await self.unregister_client(websocket)
+
+    def _register_ack(self, client_type):
+        """拼接注册确认消息，screen_info部分复用缓存的序列化结果"""
+        if self._screen_info_bytes is None:
+            self._screen_info_bytes = orjson.dumps(self.screen_info)
+        return (b'{"type":"register_ack","client_type":' + orjson.dumps(client_type)
+                + b',"screen_info":' + self._screen_info_bytes + b'}')
+
+    async def _on_register(self, websocket, message, data):
+        """客户端注册类型并回复确认"""
+        client_type = data.get('client_type', 'viewer')
+        await self.register_client(websocket, client_type)
+        record = self.clients.get(websocket)
+        if record is not None:
+            self._enqueue(record, self._register_ack(client_type), drop_oldest=False)
+
+    async def _on_screen_data(self, websocket, message, data):
+        """处理屏幕数据（来自提供者）"""
+        await self.handle_screen_data(message, data)
+
+    async def _on_control(self, websocket, message, data):
+        """处理控制事件（来自控制者或观看者）"""
+        await self.handle_control_event(websocket, data)
+
+    async def _on_get_screenshot(self, websocket, message, data):
+        """请求当前屏幕截图，回复和广播走同一个发送队列，保证帧的先后顺序"""
+        record = self.clients.get(websocket)
+        if record is None:
+            return
+        if self.current_screen_message:
+            self._enqueue(record, self.current_screen_message)
+        else:
+            self._enqueue(record, orjson.dumps({
+                'type': 'error',
+                'message': '当前没有可用的屏幕数据'
+            }), drop_oldest=False)
 
     async def handle_client_message(self, websocket, message):
         """处理客户端消息"""
         try:
-            data = json.loads(message)
-            msg_type = data.get('type')
-
-            if msg_type == 'register':
-                # 客户端注册类型
-                client_type = data.get('client_type', 'viewer')
-                await self.register_client(websocket, client_type)
-
-                # 发送注册确认
-                await websocket.send(json.dumps({
-                    'type': 'register_ack',
-                    'client_type': client_type,
-                    'screen_info': self.screen_info
-                }))
-
-            elif msg_type == 'screen_data':
-                # 处理屏幕数据（来自提供者）
-                await self.handle_screen_data(data)
-
-            elif msg_type in ['mouse', 'keyboard']:
-                # 处理控制事件（来自控制者或观看者）
-                await self.handle_control_event(websocket, data)
-
-            elif msg_type == 'get_screenshot':
-                # 请求当前屏幕截图
-                if self.current_screen_data:
-                    await websocket.send(json.dumps(self.current_screen_data))
-                else:
-                    await websocket.send(json.dumps({
-                        'type': 'error',
-                        'message': '当前没有可用的屏幕数据'
-                    }))
+            data = orjson.loads(message)
+            handler = self._dispatch.get(data.get('type'))
+            if handler is not None:
+                await handler(websocket, message, data)
 
-            elif msg_type == 'ping':
-                # 心跳检测
-                await websocket.send(json.dumps({'type': 'pong'}))
-
-        except json.JSONDecodeError:
-            print(f"无效的JSON消息: {message}")
+        except orjson.JSONDecodeError:
+            logger.warning("无效的JSON消息: %.200r", message)
         except Exception as e:
-            print(f"处理客户端消息错误: {e}")
+            logger.error("处理客户端消息错误: %s", e)
 
     async def handle_client(self, websocket):
         """处理客户端连接"""
         await self.register_client(websocket)
         try:
             async for message in websocket:
-                await self.handle_client_message(websocket, message)
+                # 二进制屏幕帧不经过JSON解析和类型分发
+                if is_msgpack_frame(message):
+                    await self.handle_screen_data_binary(message)
+                else:
+                    await self.handle_client_message(websocket, message)
         except websockets.exceptions.ConnectionClosed:
             pass
         except Exception as e:
-            print(f"客户端连接错误: {e}")
+            logger.error("客户端连接错误: %s", e)
         finally:
             await self.unregister_client(websocket)
 
     def start_websocket_server(self):
         """启动WebSocket服务器"""
-        return websockets.serve(self.handle_client, "0.0.0.0", 8765)
+        return websockets.serve(
+            self.handle_client,
+            "0.0.0.0",
+            8765,
+            # 屏幕帧是base64编码的图像，压缩几乎无收益，只会为每个连接重复消耗CPU
+            compression=None,
+            # 限制单连接的内存占用：单帧上限、入站排队帧数和发送缓冲区
+            max_size=8 * 1024 * 1024,
+            max_queue=4,
+            # 发送缓冲区高低水位低于默认的32KiB，慢连接的积压留在TCP窗口而不是进程内存
+            write_limit=(16 * 1024, 4 * 1024),
+            # 心跳使用WebSocket协议层的ping/pong控制帧，浏览器会自动应答
+            ping_interval=20,
+            ping_timeout=20
+        )
 
     def get_server_status(self):
         """获取服务器状态"""
+        roles = Counter(r.role for r in self.clients.values())
         return {
             'total_clients': len(self.clients),
-            'screen_providers': len(self.screen_providers),
-            'screen_viewers': len(self.screen_viewers),
-            'control_clients': len(self.control_clients),
-            'has_screen_data': self.current_screen_data is not None,
+            'screen_providers': roles['provider'],
+            'screen_viewers': roles['viewer'],
+            'control_clients': roles['controller'],
+            'has_screen_data': self.current_screen_message is not None,
             'screen_info': self.screen_info
         }
 
+    def get_server_status_json(self):
+        """获取序列化后的服务器状态，缓存时间内的轮询复用同一结果"""
+        now = time.monotonic()
+        if now - self._status_cache_time > STATUS_CACHE_TTL:
+            self._status_cache = orjson.dumps(self.get_server_status())
+            self._status_cache_time = now
+        return self._status_cache
+
 
 # HTML模板 - 修改为支持多种客户端类型
 HTML_TEMPLATE = '''
@@ -403,11 +539,105 @@ HTML_TEMPLATE = '''
         let isConnected = false;
         let clientType = 'viewer';
         let lastClick = 0;
+        const textDecoder = new TextDecoder('utf-8');
+        let screenObjectUrl = null;
+
+        // 精简的msgpack解码器（只解码，不支持ext类型），内嵌在页面中，局域网无外网时也能使用
+        function msgpackDecode(bytes) {
+            const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+            let pos = 0;
+
+            function uint(size) {
+                let value;
+                if (size === 1) value = view.getUint8(pos);
+                else if (size === 2) value = view.getUint16(pos);
+                else if (size === 4) value = view.getUint32(pos);
+                else value = Number(view.getBigUint64(pos));
+                pos += size;
+                return value;
+            }
+            function int(size) {
+                let value;
+                if (size === 1) value = view.getInt8(pos);
+                else if (size === 2) value = view.getInt16(pos);
+                else if (size === 4) value = view.getInt32(pos);
+                else value = Number(view.getBigInt64(pos));
+                pos += size;
+                return value;
+            }
+            function float(size) {
+                const value = size === 4 ? view.getFloat32(pos) : view.getFloat64(pos);
+                pos += size;
+                return value;
+            }
+            function str(len) {
+                const value = textDecoder.decode(bytes.subarray(pos, pos + len));
+                pos += len;
+                return value;
+            }
+            function bin(len) {
+                // 图像字节直接引用原缓冲区，不复制
+                const value = bytes.subarray(pos, pos + len);
+                pos += len;
+                return value;
+            }
+            function array(len) {
+                const value = new Array(len);
+                for (let i = 0; i < len; i++) value[i] = read();
+                return value;
+            }
+            function map(len) {
+                const value = {};
+                for (let i = 0; i < len; i++) {
+                    const key = read();
+                    value[key] = read();
+                }
+                return value;
+            }
+            function read() {
+                const type = bytes[pos++];
+                if (type < 0x80) return type;
+                if (type < 0x90) return map(type & 0x0f);
+                if (type < 0xa0) return array(type & 0x0f);
+                if (type < 0xc0) return str(type & 0x1f);
+                if (type >= 0xe0) return type - 0x100;
+                switch (type) {
+                    case 0xc0: return null;
+                    case 0xc2: return false;
+                    case 0xc3: return true;
+                    case 0xc4: return bin(uint(1));
+                    case 0xc5: return bin(uint(2));
+                    case 0xc6: return bin(uint(4));
+                    case 0xca: return float(4);
+                    case 0xcb: return float(8);
+                    case 0xcc: return uint(1);
+                    case 0xcd: return uint(2);
+                    case 0xce: return uint(4);
+                    case 0xcf: return uint(8);
+                    case 0xd0: return int(1);
+                    case 0xd1: return int(2);
+                    case 0xd2: return int(4);
+                    case 0xd3: return int(8);
+                    case 0xd9: return str(uint(1));
+                    case 0xda: return str(uint(2));
+                    case 0xdb: return str(uint(4));
+                    case 0xdc: return array(uint(2));
+                    case 0xdd: return array(uint(4));
+                    case 0xde: return map(uint(2));
+                    case 0xdf: return map(uint(4));
+                }
+                throw new Error('不支持的msgpack类型: 0x' + type.toString(16));
+            }
+
+            return read();
+        }
 
         // 连接WebSocket
         function connect() {
             clientType = document.querySelector('input[name="client-type"]:checked').value;
             ws = new WebSocket('ws://localhost:8765');
+            // 服务器以二进制帧发送UTF-8编码的JSON
+            ws.binaryType = 'arraybuffer';
             updateStatus('connecting', '连接中...');
 
             ws.onopen = function(event) {
@@ -421,7 +651,16 @@ HTML_TEMPLATE = '''
 
             ws.onmessage = function(event) {
                 try {
-                    const data = JSON.parse(event.data);
+                    let data;
+                    if (typeof event.data === 'string') {
+                        data = JSON.parse(event.data);
+                    } else if (new Uint8Array(event.data, 0, 1)[0] === 0x7b) {
+                        // 以 '{' 开头的二进制帧是UTF-8编码的JSON
+                        data = JSON.parse(textDecoder.decode(event.data));
+                    } else {
+                        // 其余二进制帧为msgpack打包的屏幕数据
+                        data = msgpackDecode(new Uint8Array(event.data));
+                    }
                     handleServerMessage(data);
                 } catch (e) {
                     console.error('解析消息错误:', e);
@@ -455,14 +694,12 @@ HTML_TEMPLATE = '''
                     }
                     break;
                 case 'screenshot':
+                case 'screen_data':
                     displayScreenshot(data);
                     break;
                 case 'error':
                     console.error('服务器错误:', data.message);
                     break;
-                case 'pong':
-                    // 心跳响应
-                    break;
             }
         }
 
@@ -471,7 +708,18 @@ HTML_TEMPLATE = '''
             const screenImg = document.getElementById('desktop-screen');
             const noScreen = document.getElementById('no-screen');
 
-            screenImg.src = data.data;
+            if (data.data instanceof Uint8Array) {
+                // msgpack帧携带原始图像字节，通过Blob URL显示并释放上一帧
+                const mime = 'image/' + (data.format || 'jpeg');
+                const url = URL.createObjectURL(new Blob([data.data], { type: mime }));
+                if (screenObjectUrl) {
+                    URL.revokeObjectURL(screenObjectUrl);
+                }
+                screenObjectUrl = url;
+                screenImg.src = url;
+            } else {
+                screenImg.src = data.data;
+            }
             screenImg.style.display = 'block';
             noScreen.style.display = 'none';
         }
@@ -656,76 +904,101 @@ HTML_TEMPLATE = '''
             // 定期更新服务器信息
             setInterval(updateServerInfo, 3000);
         });
-
-        // 心跳检测
-        setInterval(function() {
-            if (ws && ws.readyState === WebSocket.OPEN) {
-                sendMessage({ type: 'ping' });
-            }
-        }, 30000);
     </script>
 </body>
 </html>
 '''
 
-# Flask应用
-app = Flask(__name__)
-CORS(app)
+# 页面内容固定，启动时编码并压缩一次，之后每次请求直接返回
+HTML_TEMPLATE_BYTES = HTML_TEMPLATE.encode('utf-8')
+HTML_TEMPLATE_GZ = gzip.compress(HTML_TEMPLATE_BYTES, 9)
 
+# HTTP应用，与WebSocket服务运行在同一事件循环中
+routes = web.RouteTableDef()
 
-@app.route('/')
-def index():
-    return HTML_TEMPLATE
 
+@routes.get('/')
+async def index(request):
+    headers = {
+        'Content-Type': 'text/html; charset=utf-8',
+        'Cache-Control': 'public, max-age=3600',
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        return web.Response(body=HTML_TEMPLATE_GZ, headers=headers)
+    return web.Response(body=HTML_TEMPLATE_BYTES, headers=headers)
 
-@app.route('/api/status')
-def status():
-    return jsonify(server.get_server_status())
 
+@routes.get('/api/status')
+async def status(request):
+    return web.Response(
+        body=server.get_server_status_json(),
+        content_type='application/json',
+        headers={'Access-Control-Allow-Origin': '*'}
+    )
+
+
+app = web.Application()
+app.add_routes(routes)
 
 # 创建服务器实例
 server = RemoteDesktopServer()
 
 
-def run_flask():
-    """运行Flask应用"""
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+async def start_http_server():
+    """启动HTTP服务"""
+    runner = web.AppRunner(app, access_log=None)  # 不为每次状态轮询输出访问日志
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', 5000).start()
+    return runner
 
 
 async def main():
     """主函数"""
-    print("启动Web远程桌面控制系统（接受客户端屏幕传送版本）...")
-    print("HTTP服务: http://localhost:5000")
-    print("WebSocket服务: ws://localhost:8765")
-    print()
-    print("客户端类型说明:")
-    print("- 观看者(viewer): 可以查看屏幕并发送控制指令")
-    print("- 屏幕提供者(provider): 发送屏幕数据到服务器")
-    print("- 控制者(controller): 专门发送控制指令")
-    print()
+    log_listener = setup_logging()
 
-    # 在新线程中启动Flask
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    logger.info("启动Web远程桌面控制系统（接受客户端屏幕传送版本）...")
+    logger.info("HTTP服务: http://localhost:5000")
+    logger.info("WebSocket服务: ws://localhost:8765")
+    logger.info("客户端类型说明:")
+    logger.info("- 观看者(viewer): 可以查看屏幕并发送控制指令")
+    logger.info("- 屏幕提供者(provider): 发送屏幕数据到服务器")
+    logger.info("- 控制者(controller): 专门发送控制指令")
+
+    # 启动HTTP服务
+    http_runner = await start_http_server()
 
     # 启动WebSocket服务器
     websocket_server = await server.start_websocket_server()
 
-    print("服务器已启动！请在浏览器中访问 http://localhost:5000")
+    # 启动屏幕帧广播任务
+    broadcast_task = asyncio.create_task(server.broadcast_loop())
+
+    logger.info("服务器已启动！请在浏览器中访问 http://localhost:5000")
 
+    # Ctrl+C时asyncio.run会取消本协程（抛出CancelledError而不是KeyboardInterrupt），清理放在finally中
     try:
         await websocket_server.wait_closed()
-    except KeyboardInterrupt:
-        print("\n正在关闭服务器...")
+    finally:
+        logger.info("正在关闭服务器...")
         server.running = False
+        broadcast_task.cancel()
+        try:
+            await broadcast_task
+        except asyncio.CancelledError:
+            pass
+        await http_runner.cleanup()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
     # 安装依赖提示
     required_packages = [
         "websockets",
-        "flask",
-        "flask-cors"
+        "aiohttp",
+        "msgpack",
+        "orjson"
     ]
 
     print("请确保已安装以下依赖包:")
@@ -733,6 +1006,17 @@ if __name__ == "__main__":
         print(f"  pip install {pkg}")
     print()
 
+    # 可选：使用uvloop作为事件循环以提升转发吞吐量；uvloop不支持Windows
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    else:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            print("已启用uvloop事件循环")
+        except ImportError:
+            pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt:
@@ -7,29 +7,108 @@ Web远程桌面控制系统 - 改进的服务端
 
 import asyncio
 import websockets
-import json
-import base64
+import orjson
+import binascii
+import gzip
 import io
-import threading
+import logging
+import logging.handlers
+import queue
+import socket
+import struct
+import sys
 import time
-from flask import Flask, render_template_string, request, jsonify
-from flask_cors import CORS
+from enum import IntEnum
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+def setup_logging(level=logging.INFO):
+    """日志经队列交给后台线程输出，事件循环线程不直接写stdout
+
+    控制事件的逐条日志为DEBUG级别，需要排查时传入logging.DEBUG。
+    """
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    # 第三方库的逐连接、逐请求日志不输出
+    for name in ('websockets', 'aiohttp.access'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    return listener
+
+
+# 出站消息统一用orjson编码为bytes，websockets可直接发送无需再次编码
+_dumps = orjson.dumps
+
+# 内容固定的响应在加载时编码一次
+_PONG = _dumps({'type': 'pong'})
+_NO_SCREEN = _dumps({'type': 'error', 'message': '当前没有可用的屏幕数据'})
+
+# /api/status结果的缓存时间（秒），多个页面同时轮询时共用一次计算
+STATUS_CACHE_TTL = 0.5
+
+# 每个连接内核发送缓冲区的下限；手动设置SO_SNDBUF会关闭Linux的发送缓冲区自动调节，
+# 所以只在系统当前值更小时才调大
+SOCKET_SNDBUF = 256 * 1024
+
+# 每个客户端控制消息队列的长度上限，控制消息不能丢，排满说明客户端已卡住
+CONTROL_QUEUE_SIZE = 64
+
+# 二进制屏幕帧格式：JSON头 + 0x00 + 原始图像字节。JSON头总是以'{'开头，
+# 其他首字节保留给以后新增的二进制消息类型
+_FRAME_SEP = b'\x00'
+
+# 浏览器发来的二进制鼠标事件：标签(1) 事件类型 x y 按键 滚动量，大端
+_MOUSE_EVENT_TAG = b'\x01'
+_MOUSE_EVENT = struct.Struct('>BBHHBh')
+_MOUSE_EVENT_TYPES = ('click', 'double_click', 'scroll')
+_MOUSE_BUTTONS = ('left', 'right')
+
+
+class ClientKind(IntEnum):
+    """客户端角色"""
+    PROVIDER = 0
+    VIEWER = 1
+    CONTROLLER = 2
+
+
+# 注册消息中的client_type到角色的映射，未知类型按观看者处理
+_CLIENT_KINDS = {
+    'provider': ClientKind.PROVIDER,
+    'viewer': ClientKind.VIEWER,
+    'controller': ClientKind.CONTROLLER,
+}
+
+_KIND_LABELS = {
+    ClientKind.PROVIDER: "提供者",
+    ClientKind.VIEWER: "观看者",
+    ClientKind.CONTROLLER: "控制者",
+}
 
 
 class RemoteDesktopServer:
     def __init__(self):
-        self.clients = set()
-        self.screen_providers = set()
-        self.screen_viewers = set()
-        self.control_clients = set()
+        self._clients = {}  # websocket -> ClientKind，每个连接只有一个角色
+        self._members_cache = {}  # ClientKind -> 该角色连接的tuple，连接变化时清空
+        self._close_tasks = set()  # 被移除客户端的关闭任务，保留引用以免任务未执行就被回收
         self.running = True
-        self.current_screen_data = None
+        self.current_screen_message = None  # 当前屏幕数据编码后的bytes，所有发送复用
         self.screen_info = {
             'width': 0,
             'height': 0,
             'original_width': 0,
             'original_height': 0
         }
+        self._screen_info_json = None  # screen_info编码后的bytes，尺寸变化时置空
+        self._status_cache = None  # (生成时间, 编码后的状态bytes)
 
         # 性能统计
         self.stats = {
@@ -38,52 +117,150 @@ class RemoteDesktopServer:
             'start_time': time.time()
         }
 
+    def _members(self, kind):
+        """返回某一角色的全部连接，结果缓存到下一次连接变化"""
+        members = self._members_cache.get(kind)
+        if members is None:
+            members = tuple(ws for ws, k in self._clients.items() if k == kind)
+            self._members_cache[kind] = members
+        return members
+
+    @property
+    def screen_providers(self):
+        return self._members(ClientKind.PROVIDER)
+
+    @property
+    def screen_viewers(self):
+        return self._members(ClientKind.VIEWER)
+
+    @property
+    def control_clients(self):
+        return self._members(ClientKind.CONTROLLER)
+
     async def register_client(self, websocket, client_type='viewer'):
-        """注册新客户端"""
-        self.clients.add(websocket)
-
-        if client_type == 'provider':
-            self.screen_providers.add(websocket)
-            print(f"[+] 屏幕提供者已连接，当前提供者数: {len(self.screen_providers)}")
-        elif client_type == 'controller':
-            self.control_clients.add(websocket)
-            print(f"[+] 控制客户端已连接，当前控制者数: {len(self.control_clients)}")
+        """注册新客户端，已注册的连接再次注册时切换为新角色"""
+        kind = _CLIENT_KINDS.get(client_type, ClientKind.VIEWER)
+        self._clients[websocket] = kind
+        self._members_cache.clear()
+
+        # 每个连接一个常驻发送任务：屏幕帧只保留最新一帧，控制事件按顺序排队。
+        # 连接被移除后在关闭完成前又发来注册消息时，丢弃积压的消息并重新启动发送任务
+        writer = getattr(websocket, '_writer_task', None)
+        if writer is None or writer.done():
+            websocket._control_q = asyncio.Queue(maxsize=CONTROL_QUEUE_SIZE)
+            websocket._latest_screen = None
+            websocket._wake = asyncio.Event()
+            websocket._writer_task = asyncio.create_task(self._writer(websocket))
+
+        addr = getattr(websocket, '_addr', '?')
+        if kind == ClientKind.PROVIDER:
+            logger.info("[+] 屏幕提供者已连接 %s，当前提供者数: %d", addr, len(self.screen_providers))
+        elif kind == ClientKind.CONTROLLER:
+            logger.info("[+] 控制客户端已连接 %s，当前控制者数: %d", addr, len(self.control_clients))
         else:
-            self.screen_viewers.add(websocket)
-            print(f"[+] 观看客户端已连接，当前观看者数: {len(self.screen_viewers)}")
+            logger.info("[+] 观看客户端已连接 %s，当前观看者数: %d", addr, len(self.screen_viewers))
 
-        print(f"总连接数: {len(self.clients)}")
+        logger.info("总连接数: %d", len(self._clients))
 
         # 发送当前屏幕数据给新的观看者
-        if client_type == 'viewer' and self.current_screen_data:
-            try:
-                await websocket.send(json.dumps(self.current_screen_data))
-                self.stats['messages_sent'] += 1
-            except Exception as e:
-                print(f"发送屏幕数据给新客户端失败: {e}")
+        if kind == ClientKind.VIEWER and self.current_screen_message:
+            self._push_screen(websocket, self.current_screen_message)
 
     async def unregister_client(self, websocket):
         """注销客户端"""
-        self.clients.discard(websocket)
-        was_provider = websocket in self.screen_providers
-        was_viewer = websocket in self.screen_viewers
-        was_controller = websocket in self.control_clients
-
-        self.screen_providers.discard(websocket)
-        self.screen_viewers.discard(websocket)
-        self.control_clients.discard(websocket)
-
-        client_type = "提供者" if was_provider else (
-            "观看者" if was_viewer else ("控制者" if was_controller else "未知"))
-        print(f"[-] {client_type}客户端已断开，当前连接数: {len(self.clients)}")
+        kind = self._clients.pop(websocket, None)
+        if kind is not None:
+            self._members_cache.clear()
+
+        self._stop_writer(websocket)
+
+        client_type = _KIND_LABELS.get(kind, "未知")
+        logger.info("[-] %s客户端已断开 %s，当前连接数: %d",
+                    client_type, getattr(websocket, '_addr', '?'), len(self._clients))
+
+    def _drop_clients(self, clients, reason):
+        """同步移除发送失败或卡住的客户端并关闭其连接，多个客户端只输出一条汇总日志"""
+        for client in clients:
+            self._clients.pop(client, None)
+            self._stop_writer(client)
+            task = asyncio.create_task(client.close())
+            self._close_tasks.add(task)
+            task.add_done_callback(self._close_tasks.discard)
+        self._members_cache.clear()
+        logger.warning("[-] %s，已移除%d个客户端，当前连接数: %d", reason, len(clients), len(self._clients))
+
+    def _stop_writer(self, websocket):
+        """取消客户端的发送任务（发送任务自身调用时除外）"""
+        writer = getattr(websocket, '_writer_task', None)
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+
+    async def _writer(self, websocket):
+        """客户端发送任务：先发完排队的控制事件，再发最新的屏幕帧，慢客户端只阻塞自己
+
+        连接已关闭时send()会直接抛出ConnectionClosed，无需事先检查连接状态。
+        """
+        # 循环中反复用到的属性先绑定为局部变量
+        control_q = websocket._control_q
+        wake = websocket._wake
+        send = websocket.send
+        stats = self.stats
+        try:
+            while True:
+                await wake.wait()
+                wake.clear()
+
+                # 每轮发送结束后统一累加一次计数
+                sent = 0
+                try:
+                    # 屏幕提供者是外部程序，只认识单条消息，控制消息逐条发送
+                    while not control_q.empty():
+                        await send(control_q.get_nowait())
+                        sent += 1
+
+                    # 发送期间到达的新帧会直接覆盖槽位，过时的帧不会再发出
+                    message = websocket._latest_screen
+                    if message is not None:
+                        websocket._latest_screen = None
+                        await send(message)
+                        sent += 1
+                finally:
+                    stats['messages_sent'] += sent
+        except Exception as e:
+            self._drop_clients((websocket,), f"发送消息错误 {getattr(websocket, '_addr', '?')}: {e}")
+
+    def _push_screen(self, websocket, message):
+        """覆盖客户端的最新屏幕帧槽位并唤醒发送任务"""
+        websocket._latest_screen = message
+        websocket._wake.set()
+
+    def _push_control(self, websocket, message):
+        """控制事件放入客户端的FIFO队列并唤醒发送任务，队列已满时断开该客户端"""
+        control_q = websocket._control_q
+        if control_q.full():
+            if websocket in self._clients:  # 已被移除的客户端不再重复移除
+                self._drop_clients((websocket,), f"控制消息队列已满 {getattr(websocket, '_addr', '?')}")
+            return
+        control_q.put_nowait(message)
+        websocket._wake.set()
 
     async def handle_screen_data(self, data):
-        """处理屏幕数据 - 优化版本"""
+        """处理base64编码的屏幕数据，解码后转成二进制屏幕帧转发
+
+        观看者收到的是原始图像字节，省去base64约1/3的体积和浏览器端的JSON解析。
+        """
         try:
-            # 更新当前屏幕数据
-            self.current_screen_data = {
+            # data字段是 data:image/jpeg;base64,... 形式的Data URL
+            image = data.get('data') or ''
+            prefix, sep, payload = image.partition(';base64,')
+            if not sep:
+                prefix, payload = '', image
+            image_format = prefix.rpartition('/')[2] or 'jpeg'
+
+            # 二进制屏幕帧的JSON头
+            header = {
                 'type': 'screenshot',
-                'data': data.get('data'),
+                'format': image_format,
                 'width': data.get('width', 0),
                 'height': data.get('height', 0),
                 'original_width': data.get('original_width', 0),
@@ -91,117 +268,119 @@ class RemoteDesktopServer:
                 'timestamp': time.time()
             }
 
-            # 更新屏幕信息
-            self.screen_info.update({
-                'width': data.get('width', 0),
-                'height': data.get('height', 0),
-                'original_width': data.get('original_width', 0),
-                'original_height': data.get('original_height', 0)
-            })
+            self._update_screen_info(data)
+
+            # 每帧只编码一次，广播、新观看者和截图请求共用同一个bytes对象；
+            # binascii直接解码ASCII字符串，不像base64.b64decode那样先复制成bytes
+            message = _dumps(header) + _FRAME_SEP + binascii.a2b_base64(payload)
+            self.current_screen_message = message
 
-            # 并发转发给所有观看客户端
+            # 更新所有观看客户端的最新帧槽位
             if self.screen_viewers:
-                message = json.dumps(self.current_screen_data)
-                await self._broadcast_to_viewers(message)
+                self.broadcast(message, self.screen_viewers, latest_only=True)
 
         except Exception as e:
-            print(f"处理屏幕数据错误: {e}")
+            logger.error("处理屏幕数据错误: %s", e)
 
-    async def _broadcast_to_viewers(self, message):
-        """并发广播消息给观看者"""
-        if not self.screen_viewers:
-            return
+    async def handle_screen_frame_binary(self, message, sep):
+        """处理二进制屏幕帧：JSON头 + 0x00 + 原始图像字节
 
-        # 创建发送任务
-        send_tasks = []
-        for viewer in list(self.screen_viewers):  # 复制列表避免修改冲突
-            send_tasks.append(self._send_to_client(viewer, message))
-
-        # 并发执行所有发送任务
-        results = await asyncio.gather(*send_tasks, return_exceptions=True)
-
-        # 处理发送结果
-        disconnected = set()
-        for viewer, result in zip(list(self.screen_viewers), results):
-            if isinstance(result, Exception):
-                print(f"发送屏幕数据错误: {result}")
-                disconnected.add(viewer)
-            else:
-                self.stats['messages_sent'] += 1
-
-        # 移除断开的连接
-        for client in disconnected:
-            await self.unregister_client(client)
-
-    async def _send_to_client(self, client, message):
-        """发送消息给单个客户端"""
+        只解析头部，原始帧不做任何复制直接缓存并转发给观看者。
+        """
         try:
-            if client.state == websockets.protocol.State.OPEN:
-                await client.send(message)
-                return True
-            else:
-                raise websockets.exceptions.ConnectionClosed(None, None)
+            self._update_screen_info(orjson.loads(memoryview(message)[:sep]))
+
+            self.current_screen_message = message
+            if self.screen_viewers:
+                self.broadcast(message, self.screen_viewers, latest_only=True)
+
         except Exception as e:
-            raise e
+            logger.error("处理二进制屏幕帧错误: %s", e)
+
+    def _update_screen_info(self, data):
+        """更新屏幕信息，尺寸变化时使缓存的编码失效"""
+        screen_info = {
+            'width': data.get('width', 0),
+            'height': data.get('height', 0),
+            'original_width': data.get('original_width', 0),
+            'original_height': data.get('original_height', 0)
+        }
+        if screen_info != self.screen_info:
+            self.screen_info.update(screen_info)
+            self._screen_info_json = None
+
+    def broadcast(self, message, recipients, latest_only=False):
+        """把同一个已编码的bytes发给多个客户端，只入队不等待发送
+
+        latest_only为True时（屏幕帧）每个客户端只保留最新的一条。
+        """
+        push = self._push_screen if latest_only else self._push_control
+        for websocket in recipients:
+            push(websocket, message)
 
     async def handle_control_event(self, websocket, data):
         """处理控制事件 - 优化版本"""
         try:
             if not self.screen_providers:
-                print("⚠️  没有可用的屏幕提供者来处理控制事件")
+                logger.warning("⚠️  没有可用的屏幕提供者来处理控制事件")
                 return
 
-            # 记录控制事件用于调试
-            event_type = data.get('type')
-            if event_type == 'keyboard':
-                keyboard_event = data.get('event_type')
-                if keyboard_event == 'type':
-                    text = data.get('text', '')
-                    print(f"🔤 转发文字输入: '{text}'")
-                elif keyboard_event == 'hotkey':
-                    keys = data.get('keys', [])
-                    print(f"⌨️  转发快捷键: {'+'.join(keys)}")
-                else:
-                    key = data.get('key', '')
-                    print(f"🔑 转发按键: {key}")
-            elif event_type == 'mouse':
-                mouse_event = data.get('event_type')
-                x, y = data.get('x', 0), data.get('y', 0)
-                print(f"🖱️  转发鼠标事件: {mouse_event} at ({x}, {y})")
-
-            # 并发转发给所有屏幕提供者
-            message = json.dumps(data)
-            await self._broadcast_to_providers(message)
+            # 记录控制事件用于调试，未开启DEBUG时只有一次级别判断的开销
+            if logger.isEnabledFor(logging.DEBUG):
+                event_type = data.get('type')
+                if event_type == 'keyboard':
+                    keyboard_event = data.get('event_type')
+                    if keyboard_event == 'type':
+                        logger.debug("🔤 转发文字输入: '%s'", data.get('text', ''))
+                    elif keyboard_event == 'hotkey':
+                        logger.debug("⌨️  转发快捷键: %s", '+'.join(data.get('keys', [])))
+                    else:
+                        logger.debug("🔑 转发按键: %s", data.get('key', ''))
+                elif event_type == 'mouse':
+                    logger.debug("🖱️  转发鼠标事件: %s at (%s, %s)",
+                                 data.get('event_type'), data.get('x', 0), data.get('y', 0))
+
+            # 编码一次后放入所有屏幕提供者的发送队列
+            self.broadcast(_dumps(data), self.screen_providers)
 
         except Exception as e:
-            print(f"处理控制事件错误: {e}")
-
-    async def _broadcast_to_providers(self, message):
-        """并发广播消息给提供者"""
-        if not self.screen_providers:
-            return
-
-        send_tasks = []
-        for provider in list(self.screen_providers):
-            send_tasks.append(self._send_to_client(provider, message))
-
-        results = await asyncio.gather(*send_tasks, return_exceptions=True)
-
-        disconnected = set()
-        for provider, result in zip(list(self.screen_providers), results):
-            if isinstance(result, Exception):
-                print(f"转发控制事件错误: {result}")
-                disconnected.add(provider)
-            else:
-                self.stats['messages_sent'] += 1
+            logger.error("处理控制事件错误: %s", e)
+
+    def _decode_mouse_event(self, message):
+        """把二进制鼠标事件还原成屏幕提供者使用的JSON消息格式"""
+        _, event_type, x, y, button, delta = _MOUSE_EVENT.unpack(message)
+        data = {'type': 'mouse', 'event_type': _MOUSE_EVENT_TYPES[event_type], 'x': x, 'y': y}
+        if data['event_type'] == 'scroll':
+            data['delta'] = delta
+        else:
+            data['button'] = _MOUSE_BUTTONS[button]
+        return data
 
-        for client in disconnected:
-            await self.unregister_client(client)
+    def _build_register_ack(self, client_type):
+        """构造注册确认消息，screen_info片段只在尺寸变化后重新编码"""
+        if self._screen_info_json is None:
+            self._screen_info_json = _dumps(self.screen_info)
+        return (b'{"type":"register_ack","client_type":' + _dumps(client_type)
+                + b',"screen_info":' + self._screen_info_json + b'}')
 
     async def handle_client_message(self, websocket, message):
         """处理客户端消息 - 优化版本"""
         try:
-            data = json.loads(message)
+            if isinstance(message, bytes):
+                # 首字节为鼠标事件标签的是定长二进制鼠标事件，不经过JSON解析
+                if message[:1] == _MOUSE_EVENT_TAG:
+                    self.stats['messages_received'] += 1
+                    await self.handle_control_event(websocket, self._decode_mouse_event(message))
+                    return
+
+                # 含0x00分隔符的二进制帧是屏幕帧，JSON编码的消息中不会出现原始0x00
+                sep = message.find(_FRAME_SEP)
+                if sep != -1:
+                    self.stats['messages_received'] += 1
+                    await self.handle_screen_frame_binary(message, sep)
+                    return
+
+            data = orjson.loads(message)
             msg_type = data.get('type')
             self.stats['messages_received'] += 1
 
@@ -209,12 +388,8 @@ class RemoteDesktopServer:
                 client_type = data.get('client_type', 'viewer')
                 await self.register_client(websocket, client_type)
 
-                await websocket.send(json.dumps({
-                    'type': 'register_ack',
-                    'client_type': client_type,
-                    'screen_info': self.screen_info
-                }))
-                self.stats['messages_sent'] += 1
+                # 确认消息走控制队列，会先于新观看者的首帧发出
+                self._push_control(websocket, self._build_register_ack(client_type))
 
             elif msg_type == 'screen_data':
                 await self.handle_screen_data(data)
@@ -223,41 +398,52 @@ class RemoteDesktopServer:
                 await self.handle_control_event(websocket, data)
 
             elif msg_type == 'get_screenshot':
-                if self.current_screen_data:
-                    await websocket.send(json.dumps(self.current_screen_data))
-                    self.stats['messages_sent'] += 1
+                if self.current_screen_message:
+                    self._push_screen(websocket, self.current_screen_message)
                 else:
-                    await websocket.send(json.dumps({
-                        'type': 'error',
-                        'message': '当前没有可用的屏幕数据'
-                    }))
-                    self.stats['messages_sent'] += 1
+                    self._push_control(websocket, _NO_SCREEN)
 
             elif msg_type == 'ping':
-                await websocket.send(json.dumps({'type': 'pong'}))
-                self.stats['messages_sent'] += 1
+                self._push_control(websocket, _PONG)
 
-        except json.JSONDecodeError:
-            print(f"❌ 无效的JSON消息: {message}")
+        except orjson.JSONDecodeError:
+            logger.warning("❌ 无效的JSON消息: %s", message)
         except Exception as e:
-            print(f"❌ 处理客户端消息错误: {e}")
+            logger.error("❌ 处理客户端消息错误: %s", e)
 
     async def handle_client(self, websocket):
         """处理客户端连接 - 优化版本"""
-        client_address = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
-        print(f"🔗 新客户端连接: {client_address}")
+        # 地址只格式化一次并挂到连接上，其他日志通过getattr(ws, '_addr', '?')复用
+        client_address = websocket._addr = f"{websocket.remote_address[0]}:{websocket.remote_address[1]}"
+        logger.info("🔗 新客户端连接: %s", client_address)
 
+        self._tune_socket(websocket)
         await self.register_client(websocket)
         try:
             async for message in websocket:
                 await self.handle_client_message(websocket, message)
         except websockets.exceptions.ConnectionClosed:
-            print(f"🔌 客户端连接正常关闭: {client_address}")
+            logger.info("🔌 客户端连接正常关闭: %s", client_address)
         except Exception as e:
-            print(f"❌ 客户端连接错误 {client_address}: {e}")
+            logger.error("❌ 客户端连接错误 %s: %s", client_address, e)
         finally:
             await self.unregister_client(websocket)
 
+    def _tune_socket(self, websocket):
+        """把连接的内核发送缓冲区调大到SOCKET_SNDBUF
+
+        asyncio和uvloop创建TCP连接时已经关闭了Nagle算法，这里不再重复设置。
+        """
+        sock = websocket.transport.get_extra_info('socket')
+        if sock is None:
+            return
+        try:
+            # 一旦设置就是固定值，内核不再按网络状况自动调节；当前值已经够大时保持不动
+            if sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) < SOCKET_SNDBUF:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SNDBUF)
+        except OSError as e:
+            logger.warning("⚠️  设置套接字选项失败: %s", e)
+
     def start_websocket_server(self):
         """启动WebSocket服务器"""
         return websockets.serve(
@@ -265,22 +451,25 @@ class RemoteDesktopServer:
             "0.0.0.0",
             8765,
             # 优化WebSocket设置
-            ping_interval=20,
-            ping_timeout=10,
+            ping_interval=25,
+            ping_timeout=20,
             close_timeout=5,
-            max_size=10 * 1024 * 1024,  # 10MB max message size
-            compression=None  # 禁用压缩以减少延迟
+            max_size=4 * 1024 * 1024,  # 4MB，足够容纳单帧截图
+            max_queue=32,  # 接收缓冲的消息数上限，处理跟不上时对发送方形成背压
+            # 发送缓冲区高低水位低于默认的32KiB，send()超过高水位时等待排空，慢观看者不会在内存中堆积帧
+            write_limit=(16 * 1024, 4 * 1024),
+            compression=None  # JPEG已压缩，禁用permessage-deflate以免白耗CPU
         )
 
     def get_server_status(self):
         """获取服务器状态"""
         runtime = time.time() - self.stats['start_time']
         return {
-            'total_clients': len(self.clients),
+            'total_clients': len(self._clients),
             'screen_providers': len(self.screen_providers),
             'screen_viewers': len(self.screen_viewers),
             'control_clients': len(self.control_clients),
-            'has_screen_data': self.current_screen_data is not None,
+            'has_screen_data': self.current_screen_message is not None,
             'screen_info': self.screen_info,
             'stats': {
                 'runtime': runtime,
@@ -290,17 +479,28 @@ class RemoteDesktopServer:
             }
         }
 
+    def get_status_json(self):
+        """获取orjson编码的服务器状态，STATUS_CACHE_TTL内的重复查询直接返回上次的bytes"""
+        now = time.monotonic()
+        cached = self._status_cache
+        if cached is None or now - cached[0] >= STATUS_CACHE_TTL:
+            cached = self._status_cache = (now, _dumps(self.get_server_status()))
+        return cached[1]
+
     def print_statistics(self):
-        """打印服务器统计信息"""
+        """输出服务器统计信息"""
         status = self.get_server_status()
         stats = status['stats']
-        print(f"\n📊 服务器统计 (运行时间: {stats['runtime']:.1f}秒)")
-        print(
-            f"   连接: 总计={status['total_clients']} | 提供者={status['screen_providers']} | 观看者={status['screen_viewers']} | 控制者={status['control_clients']}")
-        print(
-            f"   消息: 接收={stats['messages_received']} | 发送={stats['messages_sent']} | 平均速率={stats['avg_msg_per_sec']:.1f}/秒")
-        print(
-            f"   屏幕: {status['screen_info']['width']}x{status['screen_info']['height']} | 有数据: {'是' if status['has_screen_data'] else '否'}")
+        logger.info(
+            "\n📊 服务器统计 (运行时间: %.1f秒)\n"
+            "   连接: 总计=%d | 提供者=%d | 观看者=%d | 控制者=%d\n"
+            "   消息: 接收=%d | 发送=%d | 平均速率=%.1f/秒\n"
+            "   屏幕: %sx%s | 有数据: %s",
+            stats['runtime'],
+            status['total_clients'], status['screen_providers'], status['screen_viewers'], status['control_clients'],
+            stats['messages_received'], stats['messages_sent'], stats['avg_msg_per_sec'],
+            status['screen_info']['width'], status['screen_info']['height'],
+            '是' if status['has_screen_data'] else '否')
 
 
 # 改进的HTML模板
@@ -547,7 +747,8 @@ HTML_TEMPLATE = '''
         </div>
 
         <div class="server-info" id="server-info">
-            📊 服务器状态加载中...
+            <span id="server-info-message">📊 服务器状态加载中...</span>
+            <span id="server-info-stats" style="display:none;">📊 连接统计: 总计 <span id="si-total">0</span> | 提供者 <span id="si-providers">0</span> | 观看者 <span id="si-viewers">0</span> | 控制者 <span id="si-controllers">0</span> | 消息处理: <span id="si-received">0</span>↓ <span id="si-sent">0</span>↑ | 屏幕: <span id="si-screen">-</span></span>
         </div>
 
         <div class="controls" id="controls-panel" style="display:none;">
@@ -602,6 +803,8 @@ HTML_TEMPLATE = '''
         let clientType = 'viewer';
         let lastClick = 0;
         let reconnectAttempts = 0;
+        const textDecoder = new TextDecoder('utf-8');
+        let screenObjectUrl = null;
 
         // 连接WebSocket
         function connect() {
@@ -613,6 +816,8 @@ HTML_TEMPLATE = '''
             const wsUrl = `${protocol}//${host}:8765`;
 
             ws = new WebSocket(wsUrl);
+            // 服务器以二进制帧发送UTF-8编码的JSON
+            ws.binaryType = 'arraybuffer';
             updateStatus('connecting', '连接中...');
 
             ws.onopen = function(event) {
@@ -626,8 +831,21 @@ HTML_TEMPLATE = '''
 
             ws.onmessage = function(event) {
                 try {
-                    const data = JSON.parse(event.data);
-                    handleServerMessage(data);
+                    if (typeof event.data === 'string') {
+                        handleServerMessage(JSON.parse(event.data));
+                        return;
+                    }
+
+                    // 二进制帧: JSON头 + 0x00 + 原始图像字节；无分隔符则整帧为JSON
+                    // JSON头以'{'开头，其他首字节保留给以后新增的消息类型
+                    const bytes = new Uint8Array(event.data);
+                    const sep = bytes.indexOf(0);
+                    if (sep === -1) {
+                        handleServerMessage(JSON.parse(textDecoder.decode(bytes)));
+                    } else {
+                        const header = JSON.parse(textDecoder.decode(bytes.subarray(0, sep)));
+                        displayScreenshot(header, bytes.subarray(sep + 1));
+                    }
                 } catch (e) {
                     console.error('❌ 解析消息错误:', e);
                 }
@@ -664,6 +882,7 @@ HTML_TEMPLATE = '''
                     }
                     break;
                 case 'screenshot':
+                case 'screen_data':
                     displayScreenshot(data);
                     break;
                 case 'error':
@@ -677,12 +896,23 @@ HTML_TEMPLATE = '''
         }
 
         // 显示截图
-        function displayScreenshot(data) {
+        function displayScreenshot(data, imageBytes) {
             const screenImg = document.getElementById('desktop-screen');
             const noScreen = document.getElementById('no-screen');
 
             try {
-                screenImg.src = data.data;
+                if (imageBytes) {
+                    // 原始图像字节通过Blob URL显示，并释放上一帧的URL
+                    const mime = 'image/' + (data.format || 'jpeg');
+                    const url = URL.createObjectURL(new Blob([imageBytes], { type: mime }));
+                    if (screenObjectUrl) {
+                        URL.revokeObjectURL(screenObjectUrl);
+                    }
+                    screenObjectUrl = url;
+                    screenImg.src = url;
+                } else {
+                    screenImg.src = data.data;
+                }
                 screenImg.style.display = 'block';
                 noScreen.style.display = 'none';
                 console.log(`🖼️ 屏幕更新: ${data.width}x${data.height}`);
@@ -744,8 +974,27 @@ HTML_TEMPLATE = '''
 
         // 发送消息到服务器
         function sendMessage(message) {
+            return sendRaw(JSON.stringify(message));
+        }
+
+        // 鼠标事件以定长二进制发送: 标签(1) 事件类型 x y 按键 滚动量，大端
+        const MOUSE_EVENT_TAG = 1;
+        const MOUSE_EVENT_TYPES = { click: 0, double_click: 1, scroll: 2 };
+
+        function sendMouseEvent(eventType, x, y, button, delta) {
+            const view = new DataView(new ArrayBuffer(9));
+            view.setUint8(0, MOUSE_EVENT_TAG);
+            view.setUint8(1, MOUSE_EVENT_TYPES[eventType]);
+            view.setUint16(2, Math.max(0, x));
+            view.setUint16(4, Math.max(0, y));
+            view.setUint8(6, button === 'right' ? 1 : 0);
+            view.setInt16(7, delta || 0);
+            return sendRaw(view.buffer);
+        }
+
+        function sendRaw(payload) {
             if (ws && ws.readyState === WebSocket.OPEN) {
-                ws.send(JSON.stringify(message));
+                ws.send(payload);
                 return true;
             } else {
                 console.warn('⚠️ WebSocket未连接，无法发送消息');
@@ -777,30 +1026,20 @@ HTML_TEMPLATE = '''
 
             // 双击检测
             if (now - lastClick < 300) {
-                sendMessage({
-                    type: 'mouse',
-                    event_type: 'double_click',
-                    x: coords.x,
-                    y: coords.y,
-                    button: 'left'
-                });
+                sendMouseEvent('double_click', coords.x, coords.y, 'left');
                 console.log(`🖱️ 双击: (${coords.x}, ${coords.y})`);
             } else {
                 const button = event.button === 2 ? 'right' : 'left';
-                sendMessage({
-                    type: 'mouse',
-                    event_type: 'click',
-                    x: coords.x,
-                    y: coords.y,
-                    button: button
-                });
+                sendMouseEvent('click', coords.x, coords.y, button);
                 console.log(`🖱️ ${button === 'right' ? '右' : '左'}键点击: (${coords.x}, ${coords.y})`);
             }
 
             lastClick = now;
         }
 
-        // 处理鼠标滚轮
+        // 处理鼠标滚轮：同一动画帧内的滚动累加后只发送一次
+        let pendingScroll = null;
+
         function handleWheel(event) {
             if (clientType === 'provider' || !isConnected) return;
 
@@ -808,15 +1047,24 @@ HTML_TEMPLATE = '''
             const coords = getImageCoordinates(event);
             const delta = event.deltaY > 0 ? -3 : 3;
 
-            sendMessage({
-                type: 'mouse',
-                event_type: 'scroll',
-                x: coords.x,
-                y: coords.y,
-                delta: delta
-            });
+            if (pendingScroll) {
+                pendingScroll.x = coords.x;
+                pendingScroll.y = coords.y;
+                pendingScroll.delta += delta;
+            } else {
+                pendingScroll = { x: coords.x, y: coords.y, delta: delta };
+                requestAnimationFrame(flushScroll);
+            }
+        }
+
+        function flushScroll() {
+            const scroll = pendingScroll;
+            pendingScroll = null;
+            if (!scroll || scroll.delta === 0) return;
+
+            sendMouseEvent('scroll', scroll.x, scroll.y, null, scroll.delta);
 
-            console.log(`🖱️ 滚轮: ${delta > 0 ? '上' : '下'} at (${coords.x}, ${coords.y})`);
+            console.log(`🖱️ 滚轮: ${scroll.delta > 0 ? '上' : '下'} ${Math.abs(scroll.delta)} at (${scroll.x}, ${scroll.y})`);
         }
 
         // 发送文字 - 改进版本
@@ -901,25 +1149,67 @@ HTML_TEMPLATE = '''
             setTimeout(connect, 100);
         }
 
-        // 使用新类型重新连接
+        // 使用新类型重新连接：连接仍然可用时只需重新注册，服务器会直接切换角色
         function reconnectWithType() {
+            if (ws && ws.readyState === WebSocket.OPEN) {
+                clientType = document.querySelector('input[name="client-type"]:checked').value;
+                updateStatus('connecting', '切换类型中...');
+                sendMessage({
+                    type: 'register',
+                    client_type: clientType
+                });
+                return;
+            }
             reconnect();
         }
 
         // 更新服务器信息
+        // 状态栏的文本节点只查找一次，之后只改nodeValue，不重新解析HTML
+        let serverInfoRefs = null;
+
+        function getServerInfoRefs() {
+            if (!serverInfoRefs) {
+                serverInfoRefs = {
+                    message: document.getElementById('server-info-message'),
+                    stats: document.getElementById('server-info-stats')
+                };
+                for (const name of ['total', 'providers', 'viewers', 'controllers', 'received', 'sent', 'screen']) {
+                    serverInfoRefs[name] = document.getElementById('si-' + name).firstChild;
+                }
+            }
+            return serverInfoRefs;
+        }
+
+        function setServerInfoText(node, value) {
+            value = String(value);
+            if (node.nodeValue !== value) {
+                node.nodeValue = value;
+            }
+        }
+
         function updateServerInfo() {
             fetch('/api/status')
                 .then(response => response.json())
                 .then(data => {
+                    const refs = getServerInfoRefs();
                     const stats = data.stats || {};
-                    document.getElementById('server-info').innerHTML = 
-                        `📊 连接统计: 总计 ${data.total_clients} | 提供者 ${data.screen_providers} | 观看者 ${data.screen_viewers} | 控制者 ${data.control_clients} | ` +
-                        `消息处理: ${stats.messages_received || 0}↓ ${stats.messages_sent || 0}↑ | ` +
-                        `屏幕: ${data.has_screen_data ? '✅' : '❌'} ${data.screen_info.width}x${data.screen_info.height}`;
+                    setServerInfoText(refs.total, data.total_clients);
+                    setServerInfoText(refs.providers, data.screen_providers);
+                    setServerInfoText(refs.viewers, data.screen_viewers);
+                    setServerInfoText(refs.controllers, data.control_clients);
+                    setServerInfoText(refs.received, stats.messages_received || 0);
+                    setServerInfoText(refs.sent, stats.messages_sent || 0);
+                    setServerInfoText(refs.screen,
+                        `${data.has_screen_data ? '✅' : '❌'} ${data.screen_info.width}x${data.screen_info.height}`);
+                    refs.message.style.display = 'none';
+                    refs.stats.style.display = '';
                 })
                 .catch(error => {
                     console.error('❌ 获取服务器状态失败:', error);
-                    document.getElementById('server-info').innerHTML = '❌ 无法获取服务器状态';
+                    const refs = getServerInfoRefs();
+                    setServerInfoText(refs.message.firstChild, '❌ 无法获取服务器状态');
+                    refs.stats.style.display = 'none';
+                    refs.message.style.display = '';
                 });
         }
 
@@ -973,35 +1263,56 @@ HTML_TEMPLATE = '''
 </html>
 '''
 
-# Flask应用
-app = Flask(__name__)
-CORS(app)
+# 页面内容固定，启动时编码并压缩一次，每次请求直接返回bytes
+_HTML_BYTES = HTML_TEMPLATE.encode('utf-8')
+_HTML_GZ = gzip.compress(_HTML_BYTES, 9)  # 只压缩一次，用最高压缩级别
+
+# HTTP应用，与WebSocket服务运行在同一事件循环中
+routes = web.RouteTableDef()
+
 
+@routes.get('/')
+async def index(request):
+    headers = {
+        'Content-Type': 'text/html; charset=utf-8',
+        'Cache-Control': 'public, max-age=60',  # 服务端更新页面后浏览器很快就能拿到新版本
+        'Vary': 'Accept-Encoding'
+    }
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        headers['Content-Encoding'] = 'gzip'
+        return web.Response(body=_HTML_GZ, headers=headers)
+    return web.Response(body=_HTML_BYTES, headers=headers)
 
-@app.route('/')
-def index():
-    return HTML_TEMPLATE
 
+@routes.get('/api/status')
+async def status(request):
+    return web.Response(
+        body=server.get_status_json(),
+        content_type='application/json',
+        headers={'Access-Control-Allow-Origin': '*'}
+    )
 
-@app.route('/api/status')
-def status():
-    return jsonify(server.get_server_status())
 
+app = web.Application()
+app.add_routes(routes)
 
 # 创建服务器实例
 server = RemoteDesktopServer()
 
 
-def run_flask():
-    """运行Flask应用"""
-    app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+async def start_http_server():
+    """启动HTTP服务"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '0.0.0.0', 5000).start()
+    return runner
 
 
 async def statistics_loop():
     """定期打印统计信息"""
     while server.running:
         await asyncio.sleep(60)  # 每分钟打印一次
-        if len(server.clients) > 0:
+        if server._clients:
             server.print_statistics()
 
 
@@ -1024,9 +1335,10 @@ async def main():
     print("   • 实时统计信息和日志")
     print("=" * 60)
 
-    # 在新线程中启动Flask
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
-    flask_thread.start()
+    log_listener = setup_logging()
+
+    # 启动HTTP服务
+    http_runner = await start_http_server()
 
     # 启动WebSocket服务器
     websocket_server = await server.start_websocket_server()
@@ -1039,7 +1351,8 @@ async def main():
 
     try:
         await websocket_server.wait_closed()
-    except KeyboardInterrupt:
+    finally:
+        # asyncio.run在Ctrl+C时取消main，这里收到的是CancelledError而不是KeyboardInterrupt
         print("\n🛑 正在关闭服务器...")
         server.running = False
         stats_task.cancel()
@@ -1047,14 +1360,16 @@ async def main():
             await stats_task
         except asyncio.CancelledError:
             pass
+        await http_runner.cleanup()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
     # 检查依赖
     required_packages = [
         "websockets",
-        "flask",
-        "flask-cors"
+        "aiohttp",
+        "orjson"
     ]
 
     print("📦 请确保已安装以下依赖包:")
@@ -1062,6 +1377,17 @@ if __name__ == "__main__":
         print(f"   pip install {pkg}")
     print()
 
+    # 有uvloop时用它替换默认事件循环，降低每次socket调用的开销；uvloop不支持Windows
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsProactorEventLoopPolicy())
+    else:
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+            print("⚡ 已启用uvloop事件循环")
+        except ImportError:
+            pass
+
     try:
         asyncio.run(main())
     except KeyboardInterrupt: